@@ -1,25 +1,76 @@
 import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional, Tuple
+
 from dotenv import load_dotenv
 
-load_dotenv()
 
-# Banco de dados (AWS RDS PostgreSQL)
-DATABASE_URL = os.getenv("DATABASE_URL")
+@dataclass(frozen=True, slots=True)
+class Settings:
+    """Configuração lida do ambiente (.env) UMA vez por processo."""
+
+    database_url: Optional[str]
+    db_pool_size: int
+    db_max_overflow: int
+    db_pool_pre_ping: bool
+    threadpool_tokens: int
+    admin_user: str
+    admin_password: str
+    whatsapp_numero: Optional[str]
+    cors_origins: Tuple[str, ...]
+    secret_key: str
+    templates_auto_reload: bool
+
+
+def _parse_cors_origins(raw: str) -> Tuple[str, ...]:
+    origins = tuple(origin.strip() for origin in raw.split(",") if origin.strip())
+    return origins or ("*",)  # Padrão para desenvolvimento/teste local
+
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Carrega o .env e monta Settings; chamadas seguintes reaproveitam o mesmo objeto."""
+    load_dotenv()
+    return Settings(
+        # Banco de dados (AWS RDS PostgreSQL)
+        database_url=os.getenv("DATABASE_URL"),
+        db_pool_size=int(os.getenv("DB_POOL_SIZE", "5")),
+        db_max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "5")),
+        # SELECT 1 a cada checkout do pool; desnecessário com o endpoint pooled do Neon
+        db_pool_pre_ping=os.getenv("DB_POOL_PRE_PING", "0") == "1",
+        # Threads para rotas síncronas (as que falam com o banco); 40 = padrão do AnyIO
+        threadpool_tokens=int(os.getenv("THREADPOOL_TOKENS", "40")),
+        # Admin
+        admin_user=os.getenv("ADMIN_USER", "admin"),
+        admin_password=os.getenv("ADMIN_PASSWORD", "troque_essa_senha"),
+        # WhatsApp
+        whatsapp_numero=os.getenv("WHATSAPP_NUMERO"),
+        # CORS
+        cors_origins=_parse_cors_origins(os.getenv("CORS_ORIGINS", "")),
+        # Sessão (cookie assinado do admin)
+        secret_key=os.getenv("SECRET_KEY", "change-this-secret-key"),
+        # Templates: recarregar do disco a cada render só em desenvolvimento
+        templates_auto_reload=os.getenv("TEMPLATES_AUTO_RELOAD", "0") == "1",
+    )
+
+
+# Compatibilidade: constantes de módulo usadas pelo restante do projeto
+_settings = get_settings()
+
+DATABASE_URL = _settings.database_url
+DB_POOL_SIZE = _settings.db_pool_size
+DB_MAX_OVERFLOW = _settings.db_max_overflow
+DB_POOL_PRE_PING = _settings.db_pool_pre_ping
+THREADPOOL_TOKENS = _settings.threadpool_tokens
 
-# Admin
-ADMIN_USER = os.getenv("ADMIN_USER", "admin")
-ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD", "troque_essa_senha")
+ADMIN_USER = _settings.admin_user
+ADMIN_PASSWORD = _settings.admin_password
 
+WHATSAPP_NUMERO = _settings.whatsapp_numero
 
+CORS_ORIGINS = list(_settings.cors_origins)
 
-# WhatsApp
-WHATSAPP_NUMERO = os.getenv("WHATSAPP_NUMERO")
+SECRET_KEY = _settings.secret_key
 
-# CORS
-CORS_ORIGINS = [
-    origin.strip()
-    for origin in os.getenv("CORS_ORIGINS", "").split(",")
-    if origin.strip()
-]
-if not CORS_ORIGINS:
-    CORS_ORIGINS = ["*"]  # Padrão para desenvolvimento/teste local
\ No newline at end of file
+TEMPLATES_AUTO_RELOAD = _settings.templates_auto_reload
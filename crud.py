@@ -16,17 +16,32 @@ Observação:
 
 from __future__ import annotations
 
+import csv
 import hashlib
-from typing import Optional, List
+import io
+import time
+from typing import Optional, List, Dict, Tuple
 
-from sqlalchemy.orm import Session
+from sqlalchemy import func, insert, select, text
+from sqlalchemy.orm import Session, load_only, undefer
 
 import models
 import schemas
 
 
 def _sha256_hex(data: bytes) -> str:
-    """Calcula SHA256 (hex) para ETag/cache e integridade."""
+    """
+    Calcula SHA256 (hex) para ETag/cache e integridade.
+
+    Calculado UMA vez, na escrita; o /media só lê imagem_sha256 do banco.
+    hashlib usa o OpenSSL (SHA-NI quando a CPU tem), lê o buffer sem copiar e
+    solta o GIL durante o hash (roda no threadpool, fora do event loop).
+
+    Comentário: fica SHA-256 de propósito (não blake3 etc.): o backfill no
+    Postgres usa sha256() do próprio banco e as URLs/ETags já publicadas
+    derivam desse valor; trocar o algoritmo invalidaria o cache de todas as
+    imagens e exigiria dependência nativa nova para ganho de poucos ms por upload.
+    """
     return hashlib.sha256(data).hexdigest()
 
 
@@ -44,33 +59,339 @@ def _sha256_hex(data: bytes) -> str:
 # =============================================================================
 PLACEHOLDER_IMAGE_URL = "/static/images/placeholder.png"
 
+# Prefixo do sha256 usado na URL versionada da imagem (/media/produto/{id}/{hash})
+MEDIA_VERSAO_LEN = 16
+
+
+def media_url(produto_id: int, sha256: Optional[str]) -> str:
+    """URL da imagem no DB; com sha256, versionada pelo conteúdo (/media/produto/{id}/{hash})."""
+    if sha256:
+        return f"/media/produto/{produto_id}/{sha256[:MEDIA_VERSAO_LEN]}"
+    return f"/media/produto/{produto_id}"
+
+
+# =============================================================================
+# imagem_url PRÉ-CALCULADA
+# -----------------------------------------------------------------------------
+# A URL da imagem depende só de colunas persistidas (id, imagem_bytes,
+# imagem_sha256, imagem_url externa). Então ela é gravada em imagem_url na
+# escrita (create/update) e as rotas só leem p.imagem_url, sem recalcular
+# nada por request:
+#   - com imagem no DB -> media_url(id, sha256)
+#   - sem imagem       -> URL externa (CDN) ou PLACEHOLDER_IMAGE_URL
+# =============================================================================
+
+def backfill_imagem_sha256(db: Session) -> int:
+    """
+    Backfill (startup): preenche imagem_sha256 das linhas antigas que têm imagem sem hash.
+
+    No Postgres é um único UPDATE calculado no próprio banco (sem trafegar o BLOB).
+    Retorna quantas linhas foram ajustadas.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        result = db.execute(
+            text(
+                "UPDATE produtos SET imagem_sha256 = encode(sha256(imagem_bytes), 'hex') "
+                "WHERE imagem_bytes IS NOT NULL AND imagem_sha256 IS NULL"
+            )
+        )
+        ajustadas = result.rowcount or 0
+    else:
+        pendentes = (
+            db.query(models.Produto)
+            .options(undefer(models.Produto.imagem_bytes))
+            .filter(models.Produto.imagem_bytes.isnot(None), models.Produto.imagem_sha256.is_(None))
+            .all()
+        )
+        for p in pendentes:
+            p.imagem_sha256 = _sha256_hex(p.imagem_bytes)
+        ajustadas = len(pendentes)
+
+    if ajustadas:
+        db.commit()
+    return ajustadas
+
+
+def sincronizar_imagem_urls(db: Session) -> int:
+    """
+    Backfill (startup): grava media_url(...) em imagem_url das linhas com imagem no DB
+    que ainda guardam outro valor (ex.: placeholder de versões antigas).
+
+    Não carrega o BLOB. Retorna quantas linhas foram ajustadas.
+    """
+    linhas = (
+        db.query(models.Produto.id, models.Produto.imagem_sha256, models.Produto.imagem_url)
+        .filter(models.Produto.imagem_bytes.isnot(None))
+        .all()
+    )
+
+    ajustadas = 0
+    for produto_id, sha256, url_atual in linhas:
+        url = media_url(produto_id, sha256)
+        if url_atual != url:
+            db.query(models.Produto).filter(models.Produto.id == produto_id).update(
+                {models.Produto.imagem_url: url}, synchronize_session=False
+            )
+            ajustadas += 1
+
+    if ajustadas:
+        db.commit()
+    return ajustadas
+
+
+# =============================================================================
+# CACHE: contagem de produtos ativos (vitrine)
+# -----------------------------------------------------------------------------
+# O catálogo muda pouco; refazer COUNT(*) a cada /produtos é desperdício.
+# Cache em processo por tipo, com TTL curto e invalidação nas escritas (CRUD).
+# Com vários workers (gunicorn), os outros processos enxergam a mudança no TTL.
+# _count_versao evita gravar no cache uma contagem feita antes de uma escrita.
+# =============================================================================
+COUNT_CACHE_TTL = 30.0
+
+_count_cache: Dict[Optional[str], Tuple[float, int]] = {}
+_count_versao = 0
+
+
+def _invalidate_count() -> None:
+    """Descarta as contagens em cache (chamado após create/update/delete)."""
+    global _count_versao
+    _count_versao += 1
+    _count_cache.clear()
+
+
+def descartar_contagens_em_cache() -> None:
+    """
+    Esquece as contagens deste processo SEM mudar _count_versao.
+
+    Usado quando outro worker mudou o catálogo (versao_catalogo diferente):
+    a próxima página recalcula o total em vez de usar o COUNT antigo do TTL.
+    Não incrementa _count_versao porque ele faz parte de versao_catalogo(),
+    e mudá-lo aqui invalidaria de novo o cache que acabou de ser refeito.
+    """
+    _count_cache.clear()
+
 
 # =============================================================================
 # READ
 # =============================================================================
 
+# -----------------------------------------------------------------------------
+# Consultas no estilo 2.0 (select + db.execute). Statements fixos são montados
+# UMA vez no import; os variáveis mantêm o mesmo "formato" entre chamadas.
+# Em ambos os casos o cache de SQL compilado do SQLAlchemy (query_cache_size
+# no engine) acerta e a compilação não se repete por request.
+# -----------------------------------------------------------------------------
+
+# Comentário: imagem_bytes é deferred no próprio model, então nenhuma dessas
+# consultas traz o BLOB; ele só é lido pelo /media (get_produto_imagem_bytes).
+_STMT_PRODUTOS = select(models.Produto).order_by(models.Produto.id.desc())
+_STMT_ATIVOS = _STMT_PRODUTOS.where(models.Produto.ativo.is_(True))
+
+# Vitrine (/produtos): o card só usa estas colunas; descricao (Text), sha256,
+# mime e datas ficam fora do SELECT e da hidratação de cada objeto.
+_STMT_VITRINE = _STMT_ATIVOS.options(
+    load_only(
+        models.Produto.id,
+        models.Produto.nome,
+        models.Produto.valor,
+        models.Produto.tipo,
+        models.Produto.imagem_url,
+    )
+)
+
+_STMT_IMAGEM_META = select(
+    models.Produto.imagem_sha256,
+    models.Produto.imagem_mime,
+    models.Produto.imagem_bytes.isnot(None).label("tem_imagem"),
+    models.Produto.atualizado_em,
+)
+_STMT_IMAGEM_BYTES = select(models.Produto.imagem_bytes)
+
+
 def get_produto(db: Session, *, produto_id: int) -> Optional[models.Produto]:
-    """Busca 1 produto por ID."""
-    return db.query(models.Produto).filter(models.Produto.id == produto_id).first()
+    """
+    Busca 1 produto por ID (o chamador decide sobre `ativo`).
+
+    db.get passa pelo identity map: se a sessão já carregou o produto, não há SELECT.
+    """
+    return db.get(models.Produto, produto_id)
 
 
 def get_produtos(db: Session) -> List[models.Produto]:
     """Lista todos os produtos (admin)."""
-    return (
-        db.query(models.Produto)
-        .order_by(models.Produto.id.desc())
-        .all()
-    )
+    return list(db.execute(_STMT_PRODUTOS).scalars())
 
 
 def get_produtos_ativos(db: Session) -> List[models.Produto]:
     """Lista produtos ativos (vitrine)."""
-    return (
-        db.query(models.Produto)
-        .filter(models.Produto.ativo.is_(True))
-        .order_by(models.Produto.id.desc())
-        .all()
-    )
+    return list(db.execute(_STMT_ATIVOS).scalars())
+
+
+def get_produto_imagem_meta(db: Session, *, produto_id: int):
+    """
+    Metadados da imagem de 1 produto, SEM carregar o BLOB.
+
+    Retorna Row(imagem_sha256, imagem_mime, tem_imagem, atualizado_em) ou None.
+    Usado pelo /media para decidir 304 antes de ler imagem_bytes.
+    """
+    stmt = _STMT_IMAGEM_META.where(models.Produto.id == produto_id)
+    return db.execute(stmt).first()
+
+
+def get_produto_imagem_bytes(db: Session, *, produto_id: int) -> Optional[bytes]:
+    """Lê só a coluna imagem_bytes (BLOB) de 1 produto."""
+    stmt = _STMT_IMAGEM_BYTES.where(models.Produto.id == produto_id)
+    return db.execute(stmt).scalar()
+
+
+def _count_em_cache(tipo: Optional[str]) -> Optional[int]:
+    em_cache = _count_cache.get(tipo)
+    if em_cache and time.monotonic() - em_cache[0] < COUNT_CACHE_TTL:
+        return em_cache[1]
+    return None
+
+
+def _guardar_count(tipo: Optional[str], total: int, versao: int, agora: float) -> None:
+    # Comentário: só grava se nenhuma escrita aconteceu desde o início da contagem
+    if versao == _count_versao:
+        _count_cache[tipo] = (agora, total)
+
+
+def count_produtos_ativos(db: Session, *, tipo: Optional[str] = None) -> int:
+    """Conta produtos ativos (opcionalmente por tipo), com cache de COUNT_CACHE_TTL s."""
+    total = _count_em_cache(tipo)
+    if total is not None:
+        return total
+
+    agora, versao = time.monotonic(), _count_versao
+    stmt = select(func.count(models.Produto.id)).where(models.Produto.ativo.is_(True))
+    if tipo:
+        stmt = stmt.where(models.Produto.tipo == tipo)
+    total = db.execute(stmt).scalar() or 0
+
+    _guardar_count(tipo, total, versao, agora)
+    return total
+
+
+_STMT_RESUMO = select(
+    models.Produto.id,
+    models.Produto.nome,
+    models.Produto.descricao,
+    models.Produto.valor,
+    models.Produto.tipo,
+    models.Produto.imagem_url,
+).order_by(models.Produto.id.desc())
+_STMT_ATIVOS_RESUMO = _STMT_RESUMO.where(models.Produto.ativo.is_(True))
+_STMT_ADMIN_RESUMO = _STMT_RESUMO.add_columns(models.Produto.ativo)
+
+
+def get_produtos_ativos_resumo(db: Session):
+    """
+    Produtos ativos só com as colunas da API, como Rows (tuplas nomeadas).
+
+    Sem montar objetos do ORM (identity map, estado, instrumentação) por linha.
+    """
+    return db.execute(_STMT_ATIVOS_RESUMO).all()
+
+
+def get_produtos_resumo(db: Session):
+    """Todos os produtos (admin) como Rows: colunas da tabela do painel + ativo."""
+    return db.execute(_STMT_ADMIN_RESUMO).all()
+
+
+# Comentário: dois subselects escalares e não um SELECT max(), count(): o Postgres
+# só troca MAX por uma leitura na ponta do índice (ix_produtos_atualizado_em)
+# quando TODOS os agregados da consulta são MIN/MAX; juntos, viraria uma varredura.
+_STMT_VERSAO_CATALOGO = select(
+    select(func.max(models.Produto.atualizado_em)).scalar_subquery(),
+    select(func.count(models.Produto.id)).scalar_subquery(),
+)
+
+
+def versao_catalogo(db: Session) -> Tuple:
+    """
+    "Versão" do catálogo: (_count_versao, max(atualizado_em), count(*)).
+
+    max/count cobrem TODAS as linhas: qualquer insert/update muda o max
+    (onupdate=func.now()) e todo delete muda o count, o que vale entre workers.
+    _count_versao cobre as escritas deste processo mesmo quando o relógio do
+    banco não avança (ex.: CURRENT_TIMESTAMP com resolução de segundos no SQLite).
+
+    Custo: o max sai da ponta do índice, mas o count(*) é um COUNT por request
+    (varre a PK; é o que detecta delete feito por outro worker). Barato para um
+    catálogo deste tamanho, e é 1 consulta no lugar de página + COUNT + render.
+    """
+    return (_count_versao, *db.execute(_STMT_VERSAO_CATALOGO).one())
+
+
+def get_produtos_ativos_paginados(
+    db: Session,
+    *,
+    limite: int,
+    tipo: Optional[str] = None,
+    antes_de_id: Optional[int] = None,
+    offset: int = 0,
+) -> List[models.Produto]:
+    """
+    Lista uma página de produtos ativos (vitrine), do mais novo para o mais antigo.
+
+    Paginação por keyset:
+    - antes_de_id (último id da página anterior) -> WHERE id < :antes_de_id.
+      O Postgres desce direto pelo índice parcial (ix_produtos_ativos_*), sem ler
+      e descartar as linhas das páginas anteriores como acontece com OFFSET.
+    - offset fica só como fallback para saltos diretos (ex.: ?page=7 sem cursor).
+    """
+    stmt = _STMT_VITRINE
+    if tipo:
+        stmt = stmt.where(models.Produto.tipo == tipo)
+    if antes_de_id is not None:
+        stmt = stmt.where(models.Produto.id < antes_de_id)
+
+    stmt = stmt.limit(limite)
+    if antes_de_id is None and offset:
+        stmt = stmt.offset(offset)
+    return list(db.execute(stmt).scalars())
+
+
+def get_pagina_produtos_ativos(
+    db: Session,
+    *,
+    limite: int,
+    tipo: Optional[str] = None,
+    antes_de_id: Optional[int] = None,
+    offset: int = 0,
+) -> Tuple[List[models.Produto], int]:
+    """
+    Página da vitrine + total de produtos ativos (para a paginação).
+
+    Com o total no cache (ou com cursor), é COUNT (cacheado) + página, como antes.
+    Sem total em cache, página por OFFSET e total saem de UMA consulta só,
+    com count(*) OVER () (window) em cada linha; 1 round-trip a menos no Neon.
+    Página vazia (offset além do fim) não traz o total -> COUNT normal.
+    """
+    if antes_de_id is not None or _count_em_cache(tipo) is not None:
+        total = count_produtos_ativos(db, tipo=tipo)
+        produtos = get_produtos_ativos_paginados(
+            db, limite=limite, tipo=tipo, antes_de_id=antes_de_id, offset=offset
+        )
+        return produtos, total
+
+    agora, versao = time.monotonic(), _count_versao
+    stmt = _STMT_VITRINE.add_columns(func.count().over().label("total"))
+    if tipo:
+        stmt = stmt.where(models.Produto.tipo == tipo)
+    stmt = stmt.limit(limite)
+    if offset:
+        stmt = stmt.offset(offset)
+    linhas = db.execute(stmt).all()
+
+    if not linhas:
+        return [], count_produtos_ativos(db, tipo=tipo)
+
+    total = linhas[0].total
+    _guardar_count(tipo, total, versao, agora)
+    return [linha[0] for linha in linhas], total
 
 
 # =============================================================================
@@ -137,10 +458,8 @@ def create_produto(
     # -------------------------------------------------------------------------
     # PATCH MÍNIMO:
     # O DB exige imagem_url NOT NULL, então garantimos um valor string.
-    # Se você servir imagens via /media/produto/{id}, o placeholder é só fallback.
+    # Sem imagem no DB, o placeholder é a URL final.
     # -------------------------------------------------------------------------
-    # Nota: mesmo quando houver imagem_bytes, manteremos imagem_url preenchida
-    # para não violar o NOT NULL e para manter compatibilidade com templates antigos.
     novo.imagem_url = PLACEHOLDER_IMAGE_URL
 
     if imagem_bytes:
@@ -149,16 +468,69 @@ def create_produto(
         novo.imagem_mime = (imagem_mime or "").strip() or None
         novo.imagem_sha256 = _sha256_hex(imagem_bytes)
 
-        # PATCH: NÃO pode ser None por causa do NOT NULL
-        # (antes: novo.imagem_url = None)
-        novo.imagem_url = PLACEHOLDER_IMAGE_URL
-
     db.add(novo)
+
+    if imagem_bytes:
+        # Comentário: flush gera o id (INSERT) na mesma transação; a URL final
+        # depende dele e segue no mesmo COMMIT.
+        db.flush()
+        novo.imagem_url = media_url(novo.id, novo.imagem_sha256)
+
     db.commit()
-    db.refresh(novo)
+    # Comentário: sem db.refresh(); os handlers não leem o retorno e, se alguém
+    # ler, o expire_on_commit recarrega sob demanda (1 SELECT a menos por create).
+    _invalidate_count()
     return novo
 
 
+_COPY_PRODUTOS = (
+    "COPY produtos (nome, descricao, valor, tipo, imagem_url, ativo) "
+    "FROM STDIN WITH (FORMAT csv)"
+)
+
+
+def bulk_create_produtos(db: Session, produtos: List[schemas.ProdutoCreate]) -> int:
+    """
+    Cria vários produtos (sem imagem) numa transação só. Retorna quantos foram criados.
+
+    No Postgres os dados vão num único COPY ... FROM STDIN (um round-trip para
+    o lote inteiro, em vez de INSERT por linha); nos demais bancos, um executemany.
+    Imagens entram depois, produto a produto, pelo update_produto.
+    """
+    if not produtos:
+        return 0
+
+    linhas = [
+        (
+            p.nome,
+            (p.descricao or "").strip(),
+            float(p.valor),
+            (p.tipo or "cantoneira").strip().lower(),
+            PLACEHOLDER_IMAGE_URL,  # PATCH MÍNIMO: imagem_url NOT NULL
+            True,
+        )
+        for p in produtos
+    ]
+
+    if db.get_bind().dialect.name == "postgresql":
+        buf = io.StringIO()
+        # QUOTE_NONNUMERIC: texto vazio vai como "" (string vazia) e não como NULL
+        csv.writer(buf, quoting=csv.QUOTE_NONNUMERIC).writerows(linhas)
+        buf.seek(0)
+        cur = db.connection().connection.cursor()
+        try:
+            cur.copy_expert(_COPY_PRODUTOS, buf)
+        finally:
+            cur.close()
+    else:
+        colunas = ("nome", "descricao", "valor", "tipo", "imagem_url", "ativo")
+        db.execute(insert(models.Produto), [dict(zip(colunas, linha)) for linha in linhas])
+
+    db.commit()
+    _invalidate_count()
+    return len(linhas)
+
+
 def update_produto(
     db: Session,
     *,
@@ -166,51 +538,58 @@ def update_produto(
     dados: schemas.ProdutoUpdate,
     imagem_bytes: Optional[bytes] = None,
     imagem_mime: Optional[str] = None,
-) -> Optional[models.Produto]:
+) -> bool:
     """
-    Atualiza produto existente.
+    Atualiza produto existente. Retorna False se o produto não existe.
 
     Regras:
     - Só atualiza campos que vierem preenchidos.
     - Se vier imagem_bytes, substitui a imagem e recalcula sha256.
+
+    Um único UPDATE ... WHERE id (sem SELECT antes nem refresh depois):
+    1 round-trip ao Neon em vez de 3.
     """
-    p = get_produto(db, produto_id=produto_id)
-    if not p:
-        return None
+    valores = {}
 
     # Campos básicos
     if dados.nome is not None:
-        p.nome = dados.nome
+        valores[models.Produto.nome] = dados.nome
     if dados.descricao is not None:
-        p.descricao = dados.descricao
+        valores[models.Produto.descricao] = dados.descricao
     if dados.valor is not None:
-        p.valor = float(dados.valor)
+        valores[models.Produto.valor] = float(dados.valor)
     if dados.tipo is not None:
-        p.tipo = (dados.tipo or "cantoneira").strip().lower()
+        valores[models.Produto.tipo] = (dados.tipo or "cantoneira").strip().lower()
     if dados.ativo is not None:
-        p.ativo = bool(dados.ativo)
-
-    # -------------------------------------------------------------------------
-    # PATCH MÍNIMO defensivo:
-    # garante que imagem_url nunca esteja None no objeto (DB NOT NULL).
-    # -------------------------------------------------------------------------
-    if getattr(p, "imagem_url", None) is None:
-        p.imagem_url = PLACEHOLDER_IMAGE_URL
+        valores[models.Produto.ativo] = bool(dados.ativo)
 
     # Imagem (DB)
     if imagem_bytes:
-        p.imagem_bytes = imagem_bytes
-        p.imagem_mime = (imagem_mime or "").strip() or None
-        p.imagem_sha256 = _sha256_hex(imagem_bytes)
-
-        # PATCH: NÃO pode ser None por causa do NOT NULL
-        # (antes: p.imagem_url = None)
-        if not p.imagem_url:
-            p.imagem_url = PLACEHOLDER_IMAGE_URL
-
+        sha256 = _sha256_hex(imagem_bytes)
+        valores[models.Produto.imagem_bytes] = imagem_bytes
+        valores[models.Produto.imagem_mime] = (imagem_mime or "").strip() or None
+        valores[models.Produto.imagem_sha256] = sha256
+
+        # Comentário: nova imagem -> nova URL versionada (pré-calculada)
+        valores[models.Produto.imagem_url] = media_url(produto_id, sha256)
+    else:
+        # ---------------------------------------------------------------------
+        # PATCH MÍNIMO defensivo:
+        # garante que imagem_url nunca fique NULL (DB NOT NULL), agora no SQL.
+        # ---------------------------------------------------------------------
+        valores[models.Produto.imagem_url] = func.coalesce(
+            models.Produto.imagem_url, PLACEHOLDER_IMAGE_URL
+        )
+
+    atualizados = (
+        db.query(models.Produto)
+        .filter(models.Produto.id == produto_id)
+        .update(valores, synchronize_session=False)
+    )
     db.commit()
-    db.refresh(p)
-    return p
+    if atualizados:
+        _invalidate_count()
+    return atualizados > 0
 
 
 # =============================================================================
@@ -218,11 +597,13 @@ def update_produto(
 # =============================================================================
 
 def delete_produto(db: Session, *, produto_id: int) -> bool:
-    """Remove produto."""
-    p = get_produto(db, produto_id=produto_id)
-    if not p:
-        return False
-
-    db.delete(p)
+    """Remove produto (um único DELETE ... WHERE id, sem SELECT antes)."""
+    removidos = (
+        db.query(models.Produto)
+        .filter(models.Produto.id == produto_id)
+        .delete(synchronize_session=False)
+    )
     db.commit()
-    return True
+    if removidos:
+        _invalidate_count()
+    return removidos > 0
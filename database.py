@@ -1,19 +1,35 @@
 from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.orm import sessionmaker, declarative_base
-from sqlalchemy.pool import NullPool
-from config import DATABASE_URL
+from config import DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_PRE_PING
 
 if not DATABASE_URL:
     raise ValueError("Erro crítico: DATABASE_URL não está definida nas variáveis de ambiente do Render!")
 
 engine = create_engine(
     DATABASE_URL,
-    pool_pre_ping=True,
+    # Comentário: pre_ping custa 1 round-trip (SELECT 1) em TODO checkout. Com o
+    # endpoint pooled do Neon (PgBouncer) a conexão do cliente sobrevive à
+    # suspensão do compute; o recycle abaixo cobre o resto. DB_POOL_PRE_PING=1 religa.
+    pool_pre_ping=DB_POOL_PRE_PING,
     pool_recycle=300,      # Essencial para Neon (evita conexões mortas)
-    poolclass=NullPool     # Melhor para ambientes serverless como Render
+    pool_use_lifo=True,    # reusa a conexão mais recente; as ociosas expiram no recycle
+    # Pool pequeno por worker (QueuePool): o uvicorn/gunicorn é processo longo,
+    # então reaproveitar conexões evita TCP+TLS+auth no Neon a cada request.
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=30,
+    query_cache_size=1200,  # cache de SQL compilado (statements do crud.py)
 )
 
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+
+# Rotas só de leitura: AUTOCOMMIT dispensa o BEGIN/ROLLBACK implícitos de cada
+# request (menos round-trips ao Neon). Nunca usar para escrita.
+SessionLocalRO = sessionmaker(
+    bind=engine.execution_options(isolation_level="AUTOCOMMIT"),
+    autoflush=False,
+    autocommit=False,
+)
 Base = declarative_base()
 
 def init_db():
@@ -34,3 +50,7 @@ def init_db():
                     "ADD COLUMN tipo VARCHAR(32) NOT NULL DEFAULT 'cantoneira'"
                 )
             )
+
+    # Comentário: create_all não cria índices novos em tabela já existente
+    for index in models.Produto.__table__.indexes:
+        index.create(bind=engine, checkfirst=True)
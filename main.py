@@ -21,9 +21,22 @@ from __future__ import annotations
 
 import os
 import io
-import math
-from typing import Generator, Optional, List
-
+import base64
+import binascii
+import hashlib
+import asyncio
+import re
+import secrets
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from functools import lru_cache
+from typing import BinaryIO, Generator, Optional, List
+
+import anyio
+import orjson
 from fastapi import (
     FastAPI,
     Depends,
@@ -35,25 +48,37 @@ from fastapi import (
     File,
     UploadFile,
 )
-from fastapi.responses import HTMLResponse, RedirectResponse, Response
+from fastapi.responses import (
+    HTMLResponse,
+    ORJSONResponse,
+    RedirectResponse,
+    Response,
+    StreamingResponse,
+)
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from starlette.middleware.sessions import SessionMiddleware
+from starlette.concurrency import run_in_threadpool
 
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup
 from PIL import Image, ImageOps
 
 from sqlalchemy.orm import Session
 
 import crud
 import schemas
-import models
-from database import SessionLocal, init_db
+from database import SessionLocal, SessionLocalRO, init_db
 from config import (
     ADMIN_USER,
     ADMIN_PASSWORD,
     WHATSAPP_NUMERO,
     CORS_ORIGINS,
+    SECRET_KEY,
+    TEMPLATES_AUTO_RELOAD,
+    THREADPOOL_TOKENS,
 )
 from utils import gerar_link_whatsapp, telefone_visivel
 
@@ -64,13 +89,16 @@ TIPOS_LABEL = {
     "kits": "Kits",
     "prateleiras": "Prateleiras",
 }
+# Opções de filtro/select dos templates: montadas UMA vez, não a cada request
+TIPOS_OPCOES = tuple({"id": t, "label": TIPOS_LABEL[t]} for t in TIPOS_PRODUTO)
 
 
 # =============================================================================
 # App
 # =============================================================================
 
-app = FastAPI(title="Casa das Cantoneiras")
+# Comentário: respostas JSON (dicts/listas dos handlers) saem pelo orjson
+app = FastAPI(title="Casa das Cantoneiras", default_response_class=ORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -79,22 +107,176 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+class AdminSessionMiddleware(SessionMiddleware):
+    """
+    SessionMiddleware só nas rotas /admin (único lugar que usa request.session).
+
+    No catálogo, /static e /media o cookie do admin não é verificado (HMAC +
+    base64 + JSON) nem reemitido: sem Set-Cookie, essas respostas continuam
+    cacheáveis por proxy/CDN mesmo com o admin logado.
+    """
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] == "http" and not scope["path"].startswith("/admin"):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+
 app.add_middleware(
-    SessionMiddleware,
-    secret_key=os.getenv("SECRET_KEY", "change-this-secret-key"),
+    AdminSessionMiddleware,
+    secret_key=SECRET_KEY,
     same_site="lax",
     https_only=False,
 )
 
+# Comentário: corta upload abusivo ANTES de o multipart ser lido e gravado em
+# disco (o FastAPI lê o form inteiro antes de chamar o handler). ASGI puro:
+# nenhum custo nas rotas públicas além de um startswith.
+UPLOAD_MAX_BYTES = 20 * 1024 * 1024
+
+
+class LimiteUploadMiddleware:
+    """
+    413 para POST/PUT em /admin acima de UPLOAD_MAX_BYTES.
+
+    Content-Length declarado grande -> recusa na hora. Sem Content-Length
+    (chunked) ou com valor mentiroso, conta os bytes conforme chegam e aborta
+    no primeiro bloco que passa do teto: o upload nunca é lido inteiro.
+    """
+
+    def __init__(self, app, max_bytes: int = UPLOAD_MAX_BYTES) -> None:
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send) -> None:
+        if not (
+            scope["type"] == "http"
+            and scope["method"] in ("POST", "PUT")
+            and scope["path"].startswith("/admin")
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        for nome, valor in scope["headers"]:
+            if nome == b"content-length":
+                if valor.isdigit() and int(valor) > self.max_bytes:
+                    resposta = Response("Arquivo muito grande", status_code=413)
+                    await resposta(scope, receive, send)
+                    return
+                break
+
+        recebidos = 0
+
+        async def receive_limitado():
+            nonlocal recebidos
+            mensagem = await receive()
+            if mensagem["type"] == "http.request":
+                recebidos += len(mensagem.get("body", b""))
+                if recebidos > self.max_bytes:
+                    # Comentário: HTTPException atravessa o parser de form do
+                    # FastAPI e vira 413 no handler de exceções
+                    raise HTTPException(status_code=413, detail="Arquivo muito grande")
+            return mensagem
+
+        await self.app(scope, receive_limitado, send)
+
+
+app.add_middleware(LimiteUploadMiddleware)
+
+# Comentário: formulário HTML só faz GET/POST. O form de edição do admin manda
+# POST /admin/produto/{id}?_method=PUT; aqui o método é trocado no scope ANTES do
+# roteamento, então o FastAPI cai direto no @app.put (form lido uma vez só, sem
+# handler intermediário). Só olha a query string: o corpo nem é tocado.
+_METHOD_OVERRIDE_RE = re.compile(rb"(?:^|&)_method=(PUT|DELETE)(?:&|$)", re.IGNORECASE)
+
+
+class MethodOverrideMiddleware:
+    """POST em /admin/produto/... com ?_method=PUT|DELETE vira PUT/DELETE."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if (
+            scope["type"] == "http"
+            and scope["method"] == "POST"
+            and scope["path"].startswith("/admin/produto/")
+        ):
+            m = _METHOD_OVERRIDE_RE.search(scope["query_string"])
+            if m:
+                scope = dict(scope, method=m.group(1).decode().upper())
+        await self.app(scope, receive, send)
+
+
+app.add_middleware(MethodOverrideMiddleware)
+
+
+class TextoGZipMiddleware(GZipMiddleware):
+    """
+    GZip para HTML/JSON/CSS/JS; /media e /static/images passam direto
+    (JPEG/PNG já são comprimidos: gzip só gastaria CPU e quebraria o streaming).
+    """
+
+    _SEM_GZIP = ("/media/", "/static/images/")
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] == "http" and scope["path"].startswith(self._SEM_GZIP):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+
+# Comentário: nível 4 = quase toda a redução do nível 9 por uma fração da CPU
+app.add_middleware(TextoGZipMiddleware, minimum_size=1024, compresslevel=4)
+
 # Static e templates
-app.mount("/static", StaticFiles(directory="static"), name="static")
-templates = Jinja2Templates(directory="templates")
+class CachedStaticFiles(StaticFiles):
+    """
+    StaticFiles com Cache-Control.
+    - Nome com hash (ex.: site.3f2a9c1b.css) -> imutável (1 ano).
+    - static/images (placeholder, logo, ícone) -> 1 dia; mudam raramente e o
+      placeholder aparece em vários cards de cada página do catálogo.
+    - Demais arquivos -> cache curto; navegador não revalida a cada página.
+    """
+
+    _HASHED_RE = re.compile(r"\.[0-9a-f]{8,}\.[A-Za-z0-9]+$")
+    _IMAGENS_RE = re.compile(r"[\\/]images[\\/][^\\/]+$")
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200) -> Response:
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        caminho = str(full_path)
+        if self._HASHED_RE.search(caminho):
+            response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        elif self._IMAGENS_RE.search(caminho):
+            response.headers["Cache-Control"] = "public, max-age=86400"
+        else:
+            response.headers["Cache-Control"] = "public, max-age=300"
+        return response
+
+
+app.mount("/static", CachedStaticFiles(directory="static"), name="static")
+# Comentário: bytecode cache em disco (tmp) evita reparsear os templates quando o
+# worker reinicia; sem auto_reload, o Jinja não dá stat() no arquivo a cada render.
+# Sem diretório explícito o Jinja usa um dir por usuário (modo 0700) e confere o
+# dono: ninguém mais consegue plantar bytecode que seria carregado aqui.
+templates = Jinja2Templates(
+    directory="templates",
+    bytecode_cache=FileSystemBytecodeCache(),
+    auto_reload=TEMPLATES_AUTO_RELOAD,
+)
+# Comentário: dados do WhatsApp são constantes do processo; calculados UMA vez
+# aqui e lidos pelos templates como globals (nada recalculado por request).
 templates.env.globals.update(
     WHATSAPP_NUMERO=WHATSAPP_NUMERO or "",
     WHATSAPP_DISPLAY=telefone_visivel(),
     WHATSAPP_LINK=gerar_link_whatsapp([]),
     LOGO_URL="/static/images/logomarca.png",
 )
+# Comentário: os templates recebem os objetos do ORM direto; o que antes era
+# copiado para dicts por request (fallback da imagem, rótulo do tipo) virou filtro.
+templates.env.filters["img_url"] = lambda url: url or crud.PLACEHOLDER_IMAGE_URL
+templates.env.filters["tipo_label"] = lambda tipo: TIPOS_LABEL.get(tipo, "Outros")
 
 
 # =============================================================================
@@ -110,66 +292,178 @@ def get_db() -> Generator[Session, None, None]:
         db.close()
 
 
+def get_db_ro() -> Generator[Session, None, None]:
+    """Dependency: Session somente leitura (AUTOCOMMIT) para rotas que não escrevem."""
+    db = SessionLocalRO()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@app.on_event("startup")
+async def _ajustar_threadpool() -> None:
+    # Comentário: rotas `def` (todo acesso ao banco é síncrono, via psycopg2)
+    # ocupam uma thread do AnyIO durante o round-trip ao Neon. O limite padrão
+    # (40) vira o teto de requests simultâneos esperando o banco; ajustável.
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_TOKENS
+
+
+@app.on_event("startup")
+def _aquecer_templates() -> None:
+    # Comentário: compila todos os templates no boot (com o bytecode cache, vem
+    # do disco); o 1º request de cada página não paga parse/compilação.
+    for nome in templates.env.list_templates(extensions=["html"]):
+        templates.env.get_template(nome)
+
+
 @app.on_event("startup")
 def _startup() -> None:
     # Comentário: garante tabelas (se necessário)
     init_db()
 
+    # Comentário: linhas antigas com imagem no DB podem estar sem sha256 e ainda
+    # guardar o placeholder em imagem_url; a URL versionada depende do sha256.
+    db = SessionLocal()
+    try:
+        crud.backfill_imagem_sha256(db)
+        crud.sincronizar_imagem_urls(db)
+    finally:
+        db.close()
+
 
 # =============================================================================
-# Helpers: imagem (DB) e URL para templates
+# Helpers: imagem (DB)
 # =============================================================================
 
-def _produto_image_url(p: models.Produto) -> str:
-    """
-    Decide qual URL de imagem usar no template.
+# Comentário: stale-while-revalidate deixa CDN/navegador servir a cópia vencida
+# enquanto revalida em segundo plano (sem segurar o usuário num round-trip)
+MEDIA_CACHE_IMUTAVEL = "public, max-age=31536000, immutable, stale-while-revalidate=604800"
+MEDIA_CACHE_LEGADA = "public, max-age=3600, stale-while-revalidate=604800"
 
-    Regra (seu combinado):
-    - Se existe imagem_bytes -> sempre /media/produto/{id}
-    - Senão, se existir imagem_url externa (caso alguém use CDN), usa ela
-    - Senão, placeholder
-    """
-    if getattr(p, "imagem_bytes", None):
-        return f"/media/produto/{p.id}"
 
-    url_externa = (getattr(p, "imagem_url", None) or "").strip()
-    if url_externa:
-        return url_externa
+# Comentário: teto de pixels para o decode (protege contra "decompression bomb")
+Image.MAX_IMAGE_PIXELS = 50_000_000
 
-    return "/static/images/placeholder.png"
+IMAGEM_MAX_LADO = 1600
+# JPEG já pronto (até esse tamanho) é gravado como veio, sem decode/encode
+IMAGEM_PASSTHROUGH_MAX_BYTES = 512 * 1024
 
 
-def _compress_to_jpeg(raw: bytes) -> tuple[bytes, str]:
+def _jpeg_pronto(img: Image.Image, tamanho: int) -> bool:
+    """
+    JPEG pequeno, em modo que o navegador exibe (RGB/L) e SEM metadados.
+
+    O arquivo é servido publicamente byte a byte: com EXIF/XMP (GPS, aparelho,
+    data) ele passa pelo re-encode, que descarta esses metadados.
+    """
+    return (
+        img.format == "JPEG"
+        and img.mode in ("RGB", "L")
+        and max(img.size) <= IMAGEM_MAX_LADO
+        and tamanho <= IMAGEM_PASSTHROUGH_MAX_BYTES
+        and "exif" not in img.info
+        and "xmp" not in img.info
+        and not img.getexif()
+    )
+
+
+def _compress_to_jpeg(src: BinaryIO) -> tuple[bytes, str]:
     """
     Compacta imagem (upload do admin) para JPEG com qualidade boa,
     limitando dimensões, sem depender de disco.
 
+    Recebe o arquivo do upload (SpooledTemporaryFile) e o Pillow lê direto dele,
+    sem copiar o upload inteiro para um bytes intermediário.
+
     Retorna:
       (bytes_compactados, mime)
     """
     # Comentário: tentamos abrir com Pillow; se falhar, devolve original como octet-stream
     try:
-        img = Image.open(io.BytesIO(raw))
+        tamanho = src.seek(0, io.SEEK_END)
+        src.seek(0)
+        img = Image.open(src)  # só lê o cabeçalho; o decode é preguiçoso
+        # Comentário: o Pillow só levanta erro acima de 2x o teto (entre 1x e 2x
+        # é só um warning); aqui recusamos já no teto, antes de qualquer decode
+        if img.width * img.height > Image.MAX_IMAGE_PIXELS:
+            raise Image.DecompressionBombError("imagem acima do teto de pixels")
+
+        # Comentário: foto já otimizada pelo admin -> nada a fazer; evita um
+        # ciclo completo de decode+encode (e a perda de qualidade do re-encode)
+        if _jpeg_pronto(img, tamanho):
+            src.seek(0)
+            return src.read(), "image/jpeg"
+
+        if img.format == "JPEG":
+            # Comentário: libjpeg já decodifica reduzido (1/2, 1/4, 1/8) quando
+            # a foto é bem maior que o destino; menos CPU e memória no decode
+            img.draft("RGB", (IMAGEM_MAX_LADO, IMAGEM_MAX_LADO))
         img = ImageOps.exif_transpose(img)  # corrige rotação de celular
         img = img.convert("RGB")            # JPEG precisa RGB
 
-        # Limita tamanho (mantém proporção)
-        img.thumbnail((1600, 1600))
+        # Limita tamanho (mantém proporção; thumbnail não faz nada se já for menor).
+        # BILINEAR: depois do draft/reduce a redução restante é pequena e o
+        # filtro mais curto custa bem menos CPU que o BICUBIC padrão.
+        img.thumbnail((IMAGEM_MAX_LADO, IMAGEM_MAX_LADO), Image.Resampling.BILINEAR)
 
+        # Comentário: a imagem é codificada UMA vez (upload do admin, no executor
+        # próprio) e servida milhares de vezes: vale pagar Huffman otimizado +
+        # progressivo (~10-20% menos bytes no banco e na rede, e a foto aparece
+        # antes em conexão lenta). Croma 4:2:0 fixo, sem depender do padrão do Pillow.
         out = io.BytesIO()
-        img.save(out, format="JPEG", quality=82, optimize=True)
+        img.save(
+            out,
+            format="JPEG",
+            quality=82,
+            optimize=True,
+            progressive=True,
+            subsampling=2,
+        )
         return out.getvalue(), "image/jpeg"
+    except Image.DecompressionBombError:
+        # Comentário: NÃO cai no fallback (gravaria o arquivo hostil como veio)
+        raise HTTPException(status_code=413, detail="Imagem grande demais (pixels)")
     except Exception:
         # Fallback: não derruba o admin se vier formato estranho
-        return raw, "application/octet-stream"
+        src.seek(0)
+        return src.read(), "application/octet-stream"
+
+
+def _ler_imagem_upload(imagem: Optional[UploadFile]) -> tuple[Optional[bytes], Optional[str]]:
+    """Processa o upload opcional do admin; sem arquivo -> (None, None)."""
+    if not imagem or not imagem.filename:
+        return None, None
+    return _compress_to_jpeg(imagem.file)
+
+
+# Comentário: decode/encode do Pillow roda num pool PRÓPRIO e pequeno. Assim uploads
+# do admin não ocupam as threads do pool do Starlette que atendem o catálogo.
+_IMAGEM_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix="imagem")
 
 
-def _build_paginacao(total_paginas: int, pagina_atual: int) -> list[Optional[int]]:
-    """Gera sequência de páginas; None representa reticências."""
+async def _ler_imagem_upload_async(
+    imagem: Optional[UploadFile],
+) -> tuple[Optional[bytes], Optional[str]]:
+    """_ler_imagem_upload fora do event loop (handlers async do admin)."""
+    if not imagem or not imagem.filename:
+        return None, None
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_IMAGEM_EXECUTOR, _ler_imagem_upload, imagem)
+
+
+@lru_cache(maxsize=1024)
+def _build_paginacao(total_paginas: int, pagina_atual: int) -> tuple[Optional[int], ...]:
+    """
+    Gera sequência de páginas; None representa reticências.
+
+    Função pura de (total_paginas, pagina_atual): memoizada e devolvida como
+    tupla (imutável), já que o mesmo objeto é reaproveitado entre requests.
+    """
     if total_paginas <= 0:
-        return []
+        return ()
     if total_paginas <= 7:
-        return list(range(1, total_paginas + 1))
+        return tuple(range(1, total_paginas + 1))
 
     paginas = {
         1,
@@ -188,7 +482,22 @@ def _build_paginacao(total_paginas: int, pagina_atual: int) -> list[Optional[int
             resultado.append(None)
         resultado.append(p)
         anterior = p
-    return resultado
+    return tuple(resultado)
+
+
+def _encode_cursor(ultimo_id: int) -> str:
+    """Cursor opaco da paginação: base64 url-safe do id do último item da página."""
+    return base64.urlsafe_b64encode(str(ultimo_id).encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: Optional[str]) -> Optional[int]:
+    """Inverso de _encode_cursor; cursor ausente/inválido -> None (cai no OFFSET)."""
+    if not cursor:
+        return None
+    try:
+        return int(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode())
+    except (ValueError, binascii.Error):
+        return None
 
 
 # =============================================================================
@@ -207,13 +516,36 @@ def _admin_credentials() -> tuple[str, str]:
     return user, password
 
 
+# Comentário: credenciais resolvidas UMA vez (import). Guardamos só um MAC
+# (BLAKE2b com chave aleatória do processo) de "usuário\0senha": o login vira
+# 1 hash + 1 compare_digest de tamanho fixo, sem vazar o tamanho de nenhum dos dois.
+_ADMIN_USER, _ADMIN_PASS = _admin_credentials()
+_CREDENCIAIS_CHAVE = secrets.token_bytes(32)
+
+
+def _mac_credenciais(username: str, password: str) -> bytes:
+    dados = f"{username}\0{password}".encode()
+    return hashlib.blake2b(dados, digest_size=32, key=_CREDENCIAIS_CHAVE).digest()
+
+
+_CREDENCIAIS_MAC = _mac_credenciais(_ADMIN_USER, _ADMIN_PASS) if _ADMIN_PASS else None
+
+
+def _credenciais_validas(username: str, password: str) -> bool:
+    """Compara usuário/senha em tempo constante; sem senha configurada, nunca autentica."""
+    if _CREDENCIAIS_MAC is None:
+        return False
+    return secrets.compare_digest(_mac_credenciais(username, password), _CREDENCIAIS_MAC)
+
+
 def _is_admin_authed(request: Request) -> bool:
     return request.session.get("admin_authed") is True
 
 
 def _auth_admin(request: Request) -> str:
     if _is_admin_authed(request):
-        return request.session.get("admin_user", "admin")
+        # Comentário: há um único admin; o nome não precisa viajar no cookie
+        return _ADMIN_USER
     raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
 
 
@@ -227,7 +559,6 @@ def home(request: Request):
         "home.html",
         {
             "request": request,
-            "whatsapp_numero": telefone_visivel(),
         },
     )
 
@@ -238,29 +569,103 @@ def quem_somos(request: Request):
         "quem_somos.html",
         {
             "request": request,
-            "whatsapp_numero": telefone_visivel(),
         },
     )
 
 
+# Comentário: o HTML de cada página do catálogo só muda quando o catálogo muda.
+# Chave = versão do catálogo + (tipo, página); acerto no cache dispensa página,
+# COUNT e render do Jinja. LRU: chave nova expulsa a menos usada, nunca trava.
+# Cursor só usa o cache quando é o que a página anterior emitiu (mesmo HTML da
+# página via OFFSET); cursor qualquer vindo do cliente é renderizado sem cache,
+# então não consegue encher o cache nem contaminar a página "oficial".
+PRODUTOS_HTML_CACHE_MAX = 256
+# Comentário: a página é igual para todo visitante (carrinho fica no JS);
+# 30 s de cache no navegador/CDN absorvem F5 e voltar/avançar sem custo no servidor
+PRODUTOS_HTML_CACHE_CONTROL = {"Cache-Control": "public, max-age=30"}
+_produtos_html_cache: OrderedDict[tuple, str] = OrderedDict()
+# (tipo, página) -> antes_de_id do cursor emitido pela página anterior
+_produtos_cursores: dict[tuple, int] = {}
+_produtos_html_versao: Optional[tuple] = None
+_produtos_html_lock = threading.Lock()
+
+
+# Comentário: quando a versão muda (um produto editado), as páginas são
+# renderizadas de novo, mas os cards dos outros produtos não mudaram. Cada card é
+# guardado pelo próprio conteúdo (id, nome, valor, tipo, imagem_url): card de
+# produto alterado ganha chave nova e o antigo sai por LRU, sem invalidação.
+PRODUTO_CARD_CACHE_MAX = 2048
+_produto_card_cache: OrderedDict[tuple, Markup] = OrderedDict()
+_produto_card_cache_lock = threading.Lock()
+
+
+def _render_cards(produtos) -> list[Markup]:
+    """HTML dos cards da vitrine, reaproveitando os que já foram renderizados."""
+    template = None
+    cards = []
+    for p in produtos:
+        chave = (p.id, p.nome, p.valor, p.tipo, p.imagem_url)
+        with _produto_card_cache_lock:
+            card = _produto_card_cache.get(chave)
+            if card is not None:
+                _produto_card_cache.move_to_end(chave)
+        if card is None:
+            if template is None:
+                template = templates.get_template("_produto_card.html")
+            card = Markup(template.render(p=p))
+            with _produto_card_cache_lock:
+                _produto_card_cache[chave] = card
+                if len(_produto_card_cache) > PRODUTO_CARD_CACHE_MAX:
+                    _produto_card_cache.popitem(last=False)
+        cards.append(card)
+    return cards
+
+
 @app.get("/produtos", response_class=HTMLResponse)
 def produtos(
     request: Request,
     page: int = Query(1, ge=1),
     tipo: Optional[str] = Query(None),
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(None),
+    db: Session = Depends(get_db_ro),
 ):
     tipo_filtro = (tipo or "").strip().lower() or None
     if tipo_filtro and tipo_filtro not in TIPOS_PRODUTO:
         raise HTTPException(status_code=400, detail="Tipo de produto inválido")
 
-    per_page = 20
-    base_query = db.query(models.Produto).filter(models.Produto.ativo.is_(True))
-    if tipo_filtro:
-        base_query = base_query.filter(models.Produto.tipo == tipo_filtro)
+    global _produtos_html_versao
+    # Comentário: cursor só faz sentido da página 2 em diante (é o último id da
+    # página anterior); na página 1 ele é ignorado e vale o OFFSET normal
+    antes_de_id = _decode_cursor(cursor) if page > 1 else None
+    versao = crud.versao_catalogo(db)
+    with _produtos_html_lock:
+        if versao != _produtos_html_versao:
+            # Comentário: o HTML vive enquanto a versão vive; renderizar com o COUNT
+            # (TTL) de antes da mudança gravaria paginação errada até a próxima versão
+            _produtos_html_cache.clear()
+            _produtos_cursores.clear()
+            crud.descartar_contagens_em_cache()
+            _produtos_html_versao = versao
+        chave = (versao, tipo_filtro, page)
+        cacheavel = antes_de_id is None or _produtos_cursores.get((tipo_filtro, page)) == antes_de_id
+        html = _produtos_html_cache.get(chave) if cacheavel else None
+        if html is not None:
+            _produtos_html_cache.move_to_end(chave)
+    if html is not None:
+        return HTMLResponse(html, headers=PRODUTOS_HTML_CACHE_CONTROL)
 
-    total_itens = base_query.count()
-    total_paginas = math.ceil(total_itens / per_page) if total_itens > 0 else 0
+    per_page = 20
+    # Comentário: navegação sequencial (→) chega com cursor e usa keyset;
+    # salto direto para um número de página continua com OFFSET. O total vem
+    # junto (cache de COUNT ou window na mesma consulta da página).
+    produtos, total_itens = crud.get_pagina_produtos_ativos(
+        db,
+        limite=per_page,
+        tipo=tipo_filtro,
+        antes_de_id=antes_de_id,
+        offset=(page - 1) * per_page,
+    )
+    total_paginas = -(-total_itens // per_page)  # teto da divisão, só com inteiros
 
     if total_paginas > 0 and page > total_paginas:
         qs = f"?page={total_paginas}"
@@ -268,46 +673,29 @@ def produtos(
             qs += f"&tipo={tipo_filtro}"
         return RedirectResponse(url=f"/produtos{qs}#produtos", status_code=303)
 
-    offset = (page - 1) * per_page
-    produtos = (
-        base_query
-        .order_by(models.Produto.id.desc())
-        .limit(per_page)
-        .offset(offset)
-        .all()
-    )
-
-    # Comentário: injeta URL de imagem em cada item para o template
-    view = []
-    for p in produtos:
-        view.append(
-            {
-                "id": p.id,
-                "nome": p.nome,
-                "descricao": p.descricao,
-                "valor": p.valor,
-                "tipo": p.tipo,
-                "tipo_label": TIPOS_LABEL.get(p.tipo, "Outros"),
-                "imagem_url": _produto_image_url(p),
-            }
-        )
+    proximo_cursor = _encode_cursor(produtos[-1].id) if produtos and page < total_paginas else None
 
-    return templates.TemplateResponse(
-        "produtos.html",
+    html = templates.get_template("produtos.html").render(
         {
             "request": request,
-            "produtos": view,
+            "cards": _render_cards(produtos),
             "pagina_atual": page,
             "total_paginas": total_paginas,
             "paginacao": _build_paginacao(total_paginas, page),
+            "proximo_cursor": proximo_cursor,
             "tipo_atual": tipo_filtro,
-            "tipos_produto": [{"id": t, "label": TIPOS_LABEL[t]} for t in TIPOS_PRODUTO],
-            # PATCH MÍNIMO:
-            # telefone_visivel() no seu utils.py NÃO recebe parâmetro.
-            # Ela já lê WHATSAPP_NUMERO do config.py internamente.
-            "whatsapp_numero": telefone_visivel(),
-        },
+            "tipos_produto": TIPOS_OPCOES,
+        }
     )
+    if cacheavel:
+        with _produtos_html_lock:
+            if versao == _produtos_html_versao:
+                _produtos_html_cache[chave] = html
+                if len(_produtos_html_cache) > PRODUTOS_HTML_CACHE_MAX:
+                    _produtos_html_cache.popitem(last=False)
+                if proximo_cursor:
+                    _produtos_cursores[(tipo_filtro, page + 1)] = produtos[-1].id
+    return HTMLResponse(html, headers=PRODUTOS_HTML_CACHE_CONTROL)
 
 
 @app.get("/contato", response_class=HTMLResponse)
@@ -316,13 +704,12 @@ def contato(request: Request):
         "contato.html",
         {
             "request": request,
-            "whatsapp_numero": telefone_visivel(),
         },
     )
 
 
 @app.get("/produto/{produto_id}", response_class=HTMLResponse)
-def produto_detalhe(produto_id: int, request: Request, db: Session = Depends(get_db)):
+def produto_detalhe(produto_id: int, request: Request, db: Session = Depends(get_db_ro)):
     p = crud.get_produto(db, produto_id=produto_id)
     if not p or not p.ativo:
         raise HTTPException(status_code=404, detail="Produto não encontrado")
@@ -331,24 +718,7 @@ def produto_detalhe(produto_id: int, request: Request, db: Session = Depends(get
         "produto.html",
         {
             "request": request,
-            "produto": {
-                "id": p.id,
-                "nome": p.nome,
-                "descricao": p.descricao,
-                "valor": p.valor,
-                "imagem_url": _produto_image_url(p),
-            },
-            # PATCH MÍNIMO:
-            "whatsapp_numero": telefone_visivel(),
-            "whatsapp_link": gerar_link_whatsapp(
-                [
-                    {
-                        "nome": p.nome,
-                        "quantidade": 1,
-                        "valor_unitario": float(p.valor or 0),
-                    }
-                ]
-            ),
+            "produto": p,
         },
     )
 
@@ -357,34 +727,279 @@ def produto_detalhe(produto_id: int, request: Request, db: Session = Depends(get
 # Media (serve imagem direto do DB)
 # =============================================================================
 
+MEDIA_STREAM_MIN_BYTES = 256 * 1024
+MEDIA_STREAM_CHUNK = 64 * 1024
+
+
+async def _iter_blocos(dados: bytes, tamanho: int = MEDIA_STREAM_CHUNK):
+    """Fatias de `tamanho` bytes (async: sem ida ao threadpool a cada bloco)."""
+    mv = memoryview(dados)
+    for inicio in range(0, len(mv), tamanho):
+        # Starlette só aceita bytes no corpo; a cópia é de um bloco por vez
+        yield mv[inicio:inicio + tamanho].tobytes()
+
+
+# Tokens de If-None-Match ("a", W/"b"): o regex (em C) já devolve só o valor entre aspas
+_ETAG_RE = re.compile(r'(?:W/)?"([^"]*)"')
+
+
+def _etag_confere(if_none_match: str, opaco: str) -> bool:
+    """If-None-Match pode vir como lista ("a", W/"b") ou "*" (comparação fraca, RFC 7232)."""
+    if if_none_match.strip() == "*":
+        return True
+    return opaco in _ETAG_RE.findall(if_none_match)
+
+
+def _http_date(dt: Optional[datetime]) -> Optional[str]:
+    if dt is None:
+        return None
+    if dt.tzinfo is None:
+        # Comentário: SQLite devolve datetime "naive"; o server_default é UTC
+        dt = dt.replace(tzinfo=timezone.utc)
+    return format_datetime(dt.astimezone(timezone.utc), usegmt=True)
+
+
+def _nao_modificado_desde(if_modified_since: str, dt: datetime) -> bool:
+    try:
+        desde = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    if desde.tzinfo is None:
+        desde = desde.replace(tzinfo=timezone.utc)
+    # Last-Modified tem resolução de segundos
+    return dt.replace(microsecond=0) <= desde
+
+
+# Comentário: catálogo pequeno (dezenas/centenas de fotos) -> as imagens quentes
+# cabem na RAM do worker. Chave (id, sha256): imagem nova = chave nova, então
+# nunca há entrada velha servida; o limite é por BYTES (LRU descarta as frias).
+MEDIA_RAM_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+_media_ram_cache: OrderedDict[tuple[int, str], bytes] = OrderedDict()
+_media_ram_cache_bytes = 0
+_media_ram_cache_lock = threading.Lock()
+
+
+def _media_cache_get(chave: tuple[int, str]) -> Optional[bytes]:
+    with _media_ram_cache_lock:
+        dados = _media_ram_cache.get(chave)
+        if dados is not None:
+            _media_ram_cache.move_to_end(chave)
+        return dados
+
+
+def _media_cache_put(chave: tuple[int, str], dados: bytes) -> None:
+    global _media_ram_cache_bytes
+    if len(dados) > MEDIA_RAM_CACHE_MAX_BYTES // 4:
+        return  # uma imagem enorme não expulsa o cache inteiro
+    with _media_ram_cache_lock:
+        if chave in _media_ram_cache:
+            return
+        _media_ram_cache[chave] = dados
+        _media_ram_cache_bytes += len(dados)
+        while _media_ram_cache_bytes > MEDIA_RAM_CACHE_MAX_BYTES:
+            _, antigo = _media_ram_cache.popitem(last=False)
+            _media_ram_cache_bytes -= len(antigo)
+
+
+_RANGE_RE = re.compile(r"bytes=(\d*)-(\d*)")
+
+
+def _intervalo_pedido(valor: str, total: int) -> Optional[tuple[int, int]]:
+    """
+    Interpreta `Range: bytes=a-b` (um único intervalo; "a-" e "-n" também).
+
+    Retorna (inicio, fim) inclusivo, ou None se a faixa for ininteligível
+    (nesse caso o Range é ignorado e vai a imagem inteira, como manda a RFC).
+    Faixa válida mas fora do arquivo -> (total, total), sinal de 416.
+    """
+    m = _RANGE_RE.fullmatch(valor.strip())
+    if not m or not (m.group(1) or m.group(2)):
+        return None
+    inicio, fim = m.group(1), m.group(2)
+    if not inicio:  # sufixo: últimos n bytes
+        n = int(fim)
+        if n == 0:
+            return (total, total)
+        return (max(total - n, 0), total - 1)
+    a = int(inicio)
+    b = min(int(fim), total - 1) if fim else total - 1
+    if fim and int(fim) < a:
+        return None
+    if a >= total:
+        return (total, total)
+    return (a, b)
+
+
+def _imagem_response(
+    db: Session,
+    request: Request,
+    *,
+    produto_id: int,
+    meta,
+    cache_control: str,
+) -> Response:
+    """
+    Monta a resposta da imagem.
+
+    304 antes de tocar no BLOB: If-None-Match contra o ETag (sha256) e, sem
+    If-None-Match, If-Modified-Since contra Last-Modified (atualizado_em).
+    """
+    headers = {"Cache-Control": cache_control}
+    last_modified = _http_date(meta.atualizado_em)
+    if last_modified:
+        headers["Last-Modified"] = last_modified
+
+    if_none_match = request.headers.get("if-none-match")
+    if meta.imagem_sha256:
+        etag = f'"{meta.imagem_sha256}"'
+        headers["ETag"] = etag
+        if if_none_match and _etag_confere(if_none_match, meta.imagem_sha256):
+            return Response(status_code=304, headers=headers)
+    elif meta.atualizado_em is not None:
+        # Comentário: linha antiga ainda sem sha256 (antes do backfill): ETag
+        # fraco de id + atualizado_em, sem hashear o BLOB
+        versao = f"{produto_id}-{int(meta.atualizado_em.timestamp())}"
+        headers["ETag"] = f'W/"{versao}"'
+        if if_none_match and _etag_confere(if_none_match, versao):
+            return Response(status_code=304, headers=headers)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if (
+        if_none_match is None
+        and if_modified_since
+        and meta.atualizado_em is not None
+        and _nao_modificado_desde(if_modified_since, meta.atualizado_em)
+    ):
+        return Response(status_code=304, headers=headers)
+
+    # Comentário: só aqui o BLOB sai do banco (o cliente não tem a versão atual),
+    # e só se a mesma versão ainda não estiver na RAM deste worker
+    chave = (produto_id, meta.imagem_sha256) if meta.imagem_sha256 else None
+    imagem_bytes = _media_cache_get(chave) if chave else None
+    if imagem_bytes is None:
+        imagem_bytes = crud.get_produto_imagem_bytes(db, produto_id=produto_id)
+        if not imagem_bytes:
+            raise HTTPException(status_code=404, detail="Imagem não encontrada")
+        if chave:
+            _media_cache_put(chave, imagem_bytes)
+
+    mime = meta.imagem_mime or "application/octet-stream"
+    headers["Accept-Ranges"] = "bytes"
+
+    # Comentário: Range (retomar download / proxies que pedem faixas). Com
+    # If-Range de outra versão, o Range é ignorado e vai a imagem atual inteira.
+    faixa = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    # Comentário: If-Range exige comparação forte; o ETag fraco (W/) nunca vale
+    if faixa and (if_range is None or (meta.imagem_sha256 and if_range == headers["ETag"])):
+        total = len(imagem_bytes)
+        intervalo = _intervalo_pedido(faixa, total)
+        if intervalo is not None:
+            inicio, fim = intervalo
+            if inicio >= total:
+                headers["Content-Range"] = f"bytes */{total}"
+                return Response(status_code=416, headers=headers)
+            headers["Content-Range"] = f"bytes {inicio}-{fim}/{total}"
+            return Response(
+                content=imagem_bytes[inicio:fim + 1],
+                status_code=206,
+                media_type=mime,
+                headers=headers,
+            )
+
+    if len(imagem_bytes) <= MEDIA_STREAM_MIN_BYTES:
+        return Response(content=imagem_bytes, media_type=mime, headers=headers)
+
+    # Comentário: imagem grande vai em blocos; com cliente lento o servidor
+    # respeita o controle de fluxo a cada bloco em vez de enfileirar a imagem
+    # inteira no buffer do socket. Content-Length explícito (sem chunked).
+    headers["Content-Length"] = str(len(imagem_bytes))
+    return StreamingResponse(_iter_blocos(imagem_bytes), media_type=mime, headers=headers)
+
+
 @app.get("/media/produto/{produto_id}")
-def media_produto(produto_id: int, db: Session = Depends(get_db)):
-    p = crud.get_produto(db, produto_id=produto_id)
-    if not p or not getattr(p, "imagem_bytes", None):
+def media_produto(produto_id: int, request: Request, db: Session = Depends(get_db_ro)):
+    """
+    Rota legada (sem hash na URL).
+    Com sha256 conhecido, redireciona para a URL versionada (cache imutável).
+    302 e não 301: o destino muda a cada nova imagem do produto.
+    """
+    # Comentário: só metadados (sem o BLOB)
+    meta = crud.get_produto_imagem_meta(db, produto_id=produto_id)
+    if not meta or not meta.tem_imagem:
         raise HTTPException(status_code=404, detail="Imagem não encontrada")
 
-    mime = getattr(p, "imagem_mime", None) or "application/octet-stream"
-    return Response(content=p.imagem_bytes, media_type=mime)
+    if meta.imagem_sha256:
+        return RedirectResponse(crud.media_url(produto_id, meta.imagem_sha256), status_code=302)
+
+    return _imagem_response(
+        db, request, produto_id=produto_id, meta=meta, cache_control=MEDIA_CACHE_LEGADA
+    )
+
+
+@app.get("/media/produto/{produto_id}/{versao}")
+def media_produto_versionada(
+    produto_id: int,
+    versao: str,
+    request: Request,
+    db: Session = Depends(get_db_ro),
+):
+    """
+    URL endereçada pelo conteúdo (prefixo do sha256): pode ficar em cache "para sempre".
+    Versão desatualizada -> 302 para a URL atual.
+    """
+    meta = crud.get_produto_imagem_meta(db, produto_id=produto_id)
+    if not meta or not meta.tem_imagem:
+        raise HTTPException(status_code=404, detail="Imagem não encontrada")
+
+    if not meta.imagem_sha256 or versao != meta.imagem_sha256[:crud.MEDIA_VERSAO_LEN]:
+        return RedirectResponse(crud.media_url(produto_id, meta.imagem_sha256), status_code=302)
+
+    return _imagem_response(
+        db, request, produto_id=produto_id, meta=meta, cache_control=MEDIA_CACHE_IMUTAVEL
+    )
 
 
 # =============================================================================
 # API (se existir uso em JS)
 # =============================================================================
 
+# Comentário: o JSON da lista só muda quando o catálogo muda. Guardamos os bytes
+# já serializados da última versão (crud.versao_catalogo) e, enquanto ela não
+# mudar, cada request custa 1 SELECT max/count em vez de lista + encoding.
+_api_produtos_cache: dict = {}
+
+
+def _serializar_produtos_ativos(db: Session) -> bytes:
+    linhas = crud.get_produtos_ativos_resumo(db)
+    return orjson.dumps(
+        [
+            {
+                "id": produto_id,
+                "nome": nome,
+                "descricao": descricao,
+                "valor": float(valor) if valor is not None else None,
+                "tipo": tipo,
+                "imagem_url": imagem_url or crud.PLACEHOLDER_IMAGE_URL,
+            }
+            for produto_id, nome, descricao, valor, tipo, imagem_url in linhas
+        ]
+    )
+
+
 @app.get("/api/produtos")
-def api_produtos(db: Session = Depends(get_db)):
-    produtos = crud.list_produtos(db, apenas_ativos=True)
-    return [
-        {
-            "id": p.id,
-            "nome": p.nome,
-            "descricao": p.descricao,
-            "valor": p.valor,
-            "tipo": p.tipo,
-            "imagem_url": _produto_image_url(p),
-        }
-        for p in produtos
-    ]
+def api_produtos(db: Session = Depends(get_db_ro)):
+    versao = crud.versao_catalogo(db)
+    corpo = _api_produtos_cache.get(versao)
+    if corpo is None:
+        corpo = _serializar_produtos_ativos(db)
+        # só a versão atual interessa; versões antigas nunca mais são pedidas
+        _api_produtos_cache.clear()
+        _api_produtos_cache[versao] = corpo
+    return Response(content=corpo, media_type="application/json")
 
 
 @app.post("/api/whatsapp")
@@ -412,16 +1027,15 @@ def admin_login_post(
     password: str = Form(...),
 ):
     # Comentário: valida credenciais e marca sessão no cookie assinado do SessionMiddleware
-    admin_user, admin_pass = _admin_credentials()
-    if not admin_pass or username != admin_user or password != admin_pass:
+    if not _credenciais_validas(username, password):
         return templates.TemplateResponse(
             "admin/login.html",
             {"request": request, "error": "Usuário ou senha inválidos"},
             status_code=200,
         )
 
+    # Comentário: sessão mínima -> cookie menor e menos base64/JSON/HMAC por request
     request.session["admin_authed"] = True
-    request.session["admin_user"] = admin_user
     resp = RedirectResponse("/admin", status_code=303)
     return resp
 
@@ -429,34 +1043,20 @@ def admin_login_post(
 @app.get("/admin", response_class=HTMLResponse)
 def admin_dashboard(
     request: Request,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db_ro),
 ):
     if not _is_admin_authed(request):
         return RedirectResponse("/admin/login", status_code=303)
 
-    produtos = crud.list_produtos(db, apenas_ativos=False)
-
-    view = []
-    for p in produtos:
-        view.append(
-            {
-                "id": p.id,
-                "nome": p.nome,
-                "descricao": p.descricao,
-                "valor": p.valor,
-                "ativo": p.ativo,
-                "tipo": p.tipo,
-                "tipo_label": TIPOS_LABEL.get(p.tipo, "Outros"),
-                "imagem_url": _produto_image_url(p),
-            }
-        )
+    # Comentário: Rows (acesso por atributo, como no ORM) sem hidratar objetos
+    produtos = crud.get_produtos_resumo(db)
 
     return templates.TemplateResponse(
         "admin/dashboard.html",
         {
             "request": request,
-            "produtos": view,
-            "tipos_produto": [{"id": t, "label": TIPOS_LABEL[t]} for t in TIPOS_PRODUTO],
+            "produtos": produtos,
+            "tipos_produto": TIPOS_OPCOES,
         },
     )
 
@@ -468,7 +1068,7 @@ def admin_logout(request: Request):
 
 
 @app.post("/admin/produtos/novo")
-def admin_produto_novo(
+async def admin_produto_novo(
     _: str = Depends(_auth_admin),
     nome: str = Form(...),
     descricao: str = Form(""),
@@ -478,12 +1078,7 @@ def admin_produto_novo(
     db: Session = Depends(get_db),
 ):
     # Comentário: zero disco; compacta em memória e salva no DB
-    imagem_bytes: Optional[bytes] = None
-    imagem_mime: Optional[str] = None
-
-    if imagem and imagem.filename:
-        raw = imagem.file.read()
-        imagem_bytes, imagem_mime = _compress_to_jpeg(raw)
+    imagem_bytes, imagem_mime = await _ler_imagem_upload_async(imagem)
 
     novo = schemas.ProdutoCreate(
         nome=nome,
@@ -491,13 +1086,13 @@ def admin_produto_novo(
         valor=valor,
         tipo=(tipo or "cantoneira").strip().lower(),
     )
-    crud.create_produto(db, novo, imagem_bytes=imagem_bytes, imagem_mime=imagem_mime)
+    await run_in_threadpool(crud.create_produto, db, novo, imagem_bytes=imagem_bytes, imagem_mime=imagem_mime)
 
     return RedirectResponse("/admin", status_code=303)
 
 
 @app.post("/admin/produtos/{produto_id}/atualizar")
-def admin_produto_atualizar(
+async def admin_produto_atualizar(
     produto_id: int,
     _: str = Depends(_auth_admin),
     nome: str = Form(None),
@@ -508,12 +1103,7 @@ def admin_produto_atualizar(
     imagem: UploadFile = File(None),
     db: Session = Depends(get_db),
 ):
-    imagem_bytes: Optional[bytes] = None
-    imagem_mime: Optional[str] = None
-
-    if imagem and imagem.filename:
-        raw = imagem.file.read()
-        imagem_bytes, imagem_mime = _compress_to_jpeg(raw)
+    imagem_bytes, imagem_mime = await _ler_imagem_upload_async(imagem)
 
     upd = schemas.ProdutoUpdate(
         nome=nome,
@@ -523,7 +1113,14 @@ def admin_produto_atualizar(
         ativo=ativo,
     )
 
-    crud.update_produto(db, produto_id=produto_id, dados=upd, imagem_bytes=imagem_bytes, imagem_mime=imagem_mime)
+    await run_in_threadpool(
+        crud.update_produto,
+        db,
+        produto_id=produto_id,
+        dados=upd,
+        imagem_bytes=imagem_bytes,
+        imagem_mime=imagem_mime,
+    )
     return RedirectResponse("/admin", status_code=303)
 
 
@@ -537,12 +1134,26 @@ def admin_produto_excluir(
     return RedirectResponse("/admin", status_code=303)
 
 
+@app.post("/admin/produtos/bulk")
+def admin_produtos_bulk(
+    produtos: List[schemas.ProdutoCreate],
+    _: str = Depends(_auth_admin),
+    db: Session = Depends(get_db),
+):
+    """
+    Importação em lote (JSON: lista de produtos sem imagem).
+    Tudo entra numa transação só (COPY no Postgres).
+    """
+    criados = crud.bulk_create_produtos(db, produtos)
+    return {"criados": criados}
+
+
 # =============================================================================
 # Compatibilidade de rotas do template (PATCH MÍNIMO)
 # -----------------------------------------------------------------------------
 # O template templates/admin/dashboard.html (existente no projeto) envia:
 #   - POST   /admin/produto           (criar)
-#   - POST   /admin/produto/{id} com _method=PUT (editar)  [HTML forms não suportam PUT]
+#   - POST   /admin/produto/{id}?_method=PUT (editar)  [HTML forms não suportam PUT]
 #   - DELETE /admin/produto/{id}      (excluir) via fetch()
 #
 # O backend original já tinha as rotas:
@@ -556,7 +1167,7 @@ def admin_produto_excluir(
 
 
 @app.post("/admin/produto")
-def admin_produto_novo_alias(
+async def admin_produto_novo_alias(
     _: str = Depends(_auth_admin),
     nome: str = Form(...),
     descricao: str = Form(""),
@@ -569,12 +1180,7 @@ def admin_produto_novo_alias(
     Alias para criação de produto.
     Mantém exatamente a mesma regra de criação já usada em /admin/produtos/novo.
     """
-    imagem_bytes: Optional[bytes] = None
-    imagem_mime: Optional[str] = None
-
-    if imagem and imagem.filename:
-        raw = imagem.file.read()
-        imagem_bytes, imagem_mime = _compress_to_jpeg(raw)
+    imagem_bytes, imagem_mime = await _ler_imagem_upload_async(imagem)
 
     novo = schemas.ProdutoCreate(
         nome=nome,
@@ -582,13 +1188,13 @@ def admin_produto_novo_alias(
         valor=valor,
         tipo=(tipo or "cantoneira").strip().lower(),
     )
-    crud.create_produto(db, novo, imagem_bytes=imagem_bytes, imagem_mime=imagem_mime)
+    await run_in_threadpool(crud.create_produto, db, novo, imagem_bytes=imagem_bytes, imagem_mime=imagem_mime)
 
     return RedirectResponse("/admin", status_code=303)
 
 
 @app.put("/admin/produto/{produto_id}")
-def admin_produto_atualizar_alias(
+async def admin_produto_atualizar_alias(
     produto_id: int,
     _: str = Depends(_auth_admin),
     nome: str = Form(None),
@@ -601,14 +1207,9 @@ def admin_produto_atualizar_alias(
 ):
     """
     Alias para edição de produto (PUT real).
-    O template usa POST + _method=PUT, mas também é útil ter PUT "de verdade".
+    O template usa POST + ?_method=PUT (MethodOverrideMiddleware) e cai aqui.
     """
-    imagem_bytes: Optional[bytes] = None
-    imagem_mime: Optional[str] = None
-
-    if imagem and imagem.filename:
-        raw = imagem.file.read()
-        imagem_bytes, imagem_mime = _compress_to_jpeg(raw)
+    imagem_bytes, imagem_mime = await _ler_imagem_upload_async(imagem)
 
     upd = schemas.ProdutoUpdate(
         nome=nome,
@@ -618,7 +1219,8 @@ def admin_produto_atualizar_alias(
         ativo=ativo,
     )
 
-    crud.update_produto(
+    await run_in_threadpool(
+        crud.update_produto,
         db,
         produto_id=produto_id,
         dados=upd,
@@ -628,8 +1230,11 @@ def admin_produto_atualizar_alias(
     return RedirectResponse("/admin", status_code=303)
 
 
+_METHOD_RE = re.compile(r"\s*(PUT|DELETE)\s*", re.IGNORECASE)
+
+
 @app.post("/admin/produto/{produto_id}")
-def admin_produto_method_override(
+async def admin_produto_method_override(
     produto_id: int,
     _: str = Depends(_auth_admin),
     _method: Optional[str] = Form(None),
@@ -642,13 +1247,15 @@ def admin_produto_method_override(
     db: Session = Depends(get_db),
 ):
     """
-    Suporta o padrão "_method" vindo do template:
-      - se _method=PUT -> executa a atualização
+    Fallback para "_method" no CORPO do form (dashboard aberto antes do deploy
+    ou outro cliente). O template atual manda ?_method=PUT na URL e nem chega
+    aqui: o MethodOverrideMiddleware já roteia direto para o PUT.
     """
-    method = (_method or "").strip().upper()
+    m = _METHOD_RE.fullmatch(_method or "")
+    method = m.group(1).upper() if m else ""
 
     if method == "PUT":
-        return admin_produto_atualizar_alias(
+        return await admin_produto_atualizar_alias(
             produto_id=produto_id,
             _=_,
             nome=nome,
@@ -659,6 +1266,9 @@ def admin_produto_method_override(
             imagem=imagem,
             db=db,
         )
+    if method == "DELETE":
+        await run_in_threadpool(crud.delete_produto, db, produto_id=produto_id)
+        return RedirectResponse("/admin", status_code=303)
 
     raise HTTPException(
         status_code=status.HTTP_405_METHOD_NOT_ALLOWED,
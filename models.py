@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Numeric, Boolean, DateTime, func, Text, LargeBinary
+from sqlalchemy import Column, Integer, String, Numeric, Boolean, DateTime, func, Text, LargeBinary, Index
+from sqlalchemy.orm import deferred
 from database import Base
 
 class Produto(Base):
@@ -18,10 +19,22 @@ class Produto(Base):
 
     # Armazenamento confiável (DB): evita perder imagens em filesystem efêmero (Render/free tiers)
     imagem_mime = Column(String(64), nullable=True)
-    imagem_bytes = Column(LargeBinary, nullable=True)
+    # deferred: o BLOB nunca entra no SELECT da entidade (listas, detalhe, admin);
+    # só é lido sob demanda (crud.get_produto_imagem_bytes / undefer explícito).
+    imagem_bytes = deferred(Column(LargeBinary, nullable=True))
     imagem_sha256 = Column(String(64), nullable=True)
 
     ativo = Column(Boolean, default=True)
 
     criado_em = Column(DateTime(timezone=True), server_default=func.now())
     atualizado_em = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    # Vitrine (/produtos): ativos em ORDER BY id DESC, com ou sem filtro de tipo.
+    # Índices parciais servem a paginação por keyset (WHERE id < :cursor) direto do índice.
+    # atualizado_em: max() da versão do catálogo (crud.versao_catalogo, em subselect
+    # próprio) vira 1 leitura na ponta do índice em vez de varrer a tabela.
+    __table_args__ = (
+        Index("ix_produtos_ativos_id", id.desc(), postgresql_where=ativo.is_(True)),
+        Index("ix_produtos_ativos_tipo_id", tipo, id.desc(), postgresql_where=ativo.is_(True)),
+        Index("ix_produtos_atualizado_em", atualizado_em),
+    )
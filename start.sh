@@ -4,4 +4,11 @@
 python -c "from main import init_db_and_admin; init_db_and_admin()"
 
 # Inicia o servidor Gunicorn
-gunicorn main:app --workers 4 --worker-class uvicorn.workers.UvicornWorker --bind 0.0.0.0:$PORT
\ No newline at end of file
+# - UvicornWorker usa loop/http "auto": com uvicorn[standard] (requirements.txt)
+#   isso já é uvloop + httptools.
+# - Cada worker tem seu pool (DB_POOL_SIZE + DB_MAX_OVERFLOW conexões): o total
+#   é WEB_CONCURRENCY x (pool + overflow). Ajuste via WEB_CONCURRENCY (padrão 4).
+gunicorn main:app \
+  --workers "${WEB_CONCURRENCY:-4}" \
+  --worker-class uvicorn.workers.UvicornWorker \
+  --bind 0.0.0.0:$PORT
\ No newline at end of file
@@ -1,11 +1,21 @@
 from urllib.parse import quote_plus
 from config import WHATSAPP_NUMERO
 
+_CABECALHO = "Olá! Tenho interesse nos seguintes itens da Casa das Cantoneiras:\n\n"
+_RODAPE = "\n\nPode me passar orçamento com frete e prazo de entrega?\nObrigado!"
+
+# Partes fixas da mensagem já codificadas UMA vez (quote_plus é caractere a
+# caractere, então concatenar pedaços codificados = codificar o texto inteiro)
+_LINK_BASE = f"https://wa.me/{WHATSAPP_NUMERO}"
+_LINK_PREFIXO = f"{_LINK_BASE}?text={quote_plus(_CABECALHO)}"
+_RODAPE_Q = quote_plus(_RODAPE)
+
+
 def gerar_link_whatsapp(itens):
     if not itens:
-        return f"https://wa.me/{WHATSAPP_NUMERO}"
+        return _LINK_BASE
 
-    texto = "Olá! Tenho interesse nos seguintes itens da Casa das Cantoneiras:\n\n"
+    partes = [_LINK_PREFIXO]
     total = 0.0
 
     for item in itens:
@@ -13,11 +23,13 @@ def gerar_link_whatsapp(itens):
         valor_un = float(item["valor_unitario"])
         subtotal = qtd * valor_un
         total += subtotal
-        texto += f"• {qtd}x {item['nome']} - R$ {valor_un:.2f}/un → R$ {subtotal:.2f}\n"
-
-    texto += f"\nTotal estimado: R$ {total:.2f}\n\nPode me passar orçamento com frete e prazo de entrega?\nObrigado!"
+        partes.append(
+            quote_plus(f"• {qtd}x {item['nome']} - R$ {valor_un:.2f}/un → R$ {subtotal:.2f}\n")
+        )
 
-    return f"https://wa.me/{WHATSAPP_NUMERO}?text={quote_plus(texto)}"
+    partes.append(quote_plus(f"\nTotal estimado: R$ {total:.2f}"))
+    partes.append(_RODAPE_Q)
+    return "".join(partes)
 
 
 # ----- Helpers for templates -----